@@ -6,14 +6,16 @@ from PIL import Image
 from resume_logic import (
     extract_text,
     extract_candidate_details,
-    extract_skills_from_jd,
+    get_jd_artifacts,
     detect_skill_gaps,
-    save_to_db,
+    compute_similarities,
+    file_hash,
+    get_resume_embeddings,
+    save_many_to_db,
     load_all_data,
-    model,
-    util,
-    JOB_CATEGORIES,
-    ROLE_SKILLS
+    load_skill_gap_counts,
+    rescore_all,
+    JOB_CATEGORIES
 )
 
 # ---------------------- APP CONFIG ----------------------
@@ -127,6 +129,13 @@ with st.sidebar:
     """, unsafe_allow_html=True)
 
 
+# ---------------------- HELPERS ----------------------
+# CSV export is only rebuilt when the data changes, not on every rerun
+@st.cache_data(max_entries=4)
+def _df_csv(df: pd.DataFrame) -> bytes:
+    return df.to_csv(index=False).encode()
+
+
 # ---------------------- PAGE 1: MULTI RESUME ANALYSIS ----------------------
 if page == "Upload & Analyze":
     st.title("Upload Resumes for Analysis")
@@ -148,61 +157,80 @@ if page == "Upload & Analyze":
         if not uploaded_files:
             st.warning("Please upload at least one resume.")
         else:
-            st.info(f"Analyzing {len(uploaded_files)} resume(s) for the **{role}** role...")
-            with st.spinner("Running AI model for semantic matching..."):
-
-                jd_text = ROLE_SKILLS.get(role, "")
-                jd_embedding = model.encode(jd_text, convert_to_tensor=True)
-                jd_skills = extract_skills_from_jd(jd_text)
-
-                results = []
-                for file in uploaded_files:
-                    text = extract_text(file)
-                    if text.strip():
-                        resume_embedding = model.encode(text, convert_to_tensor=True)
-                        similarity = util.cos_sim(jd_embedding, resume_embedding).item()
-
-                        info = extract_candidate_details(text)
+            file_hashes = [file_hash(f) for f in uploaded_files]
+            cache_key = (role, tuple(sorted(file_hashes)))
+            df = None
+            if st.session_state.get("cache_key") == cache_key:
+                # Same role and files as the last run: reuse its results instead of re-analyzing
+                df = st.session_state["analysis_results"]
+            else:
+                st.info(f"Analyzing {len(uploaded_files)} resume(s) for the **{role}** role...")
+                with st.spinner("Running AI model for semantic matching..."):
+
+                    jd_embedding, jd_skills = get_jd_artifacts(role)
+
+                    texts, infos, filenames, hashes = [], [], [], []
+                    for file, h in zip(uploaded_files, file_hashes):
+                        text = extract_text(file)
+                        if text.strip():
+                            texts.append(text)
+                            infos.append(extract_candidate_details(text))
+                            filenames.append(file.name)
+                            hashes.append(h)
+
+                    similarities = []
+                    if texts:
+                        resume_embeddings = get_resume_embeddings(hashes, texts)
+                        similarities = compute_similarities(jd_embedding, resume_embeddings)
+
+                    results, db_rows = [], []
+                    for info, filename, h, similarity in zip(infos, filenames, hashes, similarities):
                         matched_skills, skill_gaps = detect_skill_gaps(jd_skills, info["Skills"])
 
                         results.append({
                             "Name": info["Name"],
                             "Email": info["Email"],
                             "Phone": info["Phone"],
-                            "Resume": file.name,
+                            "Resume": filename,
                             "Similarity": round(similarity * 100, 2),
                             "Matched Skills": ", ".join(matched_skills),
                             "Skill Gaps": ", ".join(skill_gaps)
                         })
 
-                        save_to_db({
+                        db_rows.append({
                             "name": info["Name"],
                             "email": info["Email"],
                             "phone": info["Phone"],
-                            "filename": file.name,
+                            "filename": filename,
+                            "file_hash": h,
                             "job_category": job_category,
                             "role": role,
                             "similarity": round(similarity * 100, 2),
-                            "matched_skills": ", ".join(matched_skills),
-                            "skill_gaps": ", ".join(skill_gaps)
+                            "matched_skills": matched_skills,
+                            "skill_gaps": skill_gaps
                         })
 
-                if results:
-                    df = pd.DataFrame(results).sort_values("Similarity", ascending=False)
-                    st.session_state["analysis_results"] = df
-                    st.session_state["selected_role"] = role
-
-                    st.success("Analysis Complete!")
-                    st.subheader("Ranked Candidates")
-                    st.dataframe(df, use_container_width=True)
-                    st.download_button(
-                        "Download Analysis Report (CSV)",
-                        df.to_csv(index=False),
-                        file_name="resume_analysis_report.csv"
-                    )
-                    st.info("You can now view the Dashboard or Admin Panel for deeper insights.")
-                else:
-                    st.warning("No valid resumes processed.")
+                    if db_rows:
+                        save_many_to_db(db_rows)
+
+                    if results:
+                        df = pd.DataFrame(results).sort_values("Similarity", ascending=False)
+                        st.session_state["analysis_results"] = df
+                        st.session_state["selected_role"] = role
+                        st.session_state["cache_key"] = cache_key
+
+            if df is not None:
+                st.success("Analysis Complete!")
+                st.subheader("Ranked Candidates")
+                st.dataframe(df, use_container_width=True)
+                st.download_button(
+                    "Download Analysis Report (CSV)",
+                    _df_csv(df),
+                    file_name="resume_analysis_report.csv"
+                )
+                st.info("You can now view the Dashboard or Admin Panel for deeper insights.")
+            else:
+                st.warning("No valid resumes processed.")
 
 # ---------------------- PAGE 2: DASHBOARD ----------------------
 elif page == "Dashboard":
@@ -235,10 +263,11 @@ elif page == "Dashboard":
         st.plotly_chart(fig1, use_container_width=True)
 
         # --- Skill Gap Frequency ---
-        all_gaps = [gap.strip() for gaps in df["Skill Gaps"] for gap in gaps.split(",") if gap.strip()]
-        if all_gaps:
-            gap_df = pd.DataFrame({"Skill Gap": all_gaps})
-            gap_count = gap_df["Skill Gap"].value_counts().reset_index()
+        gap_count = (
+            df["Skill Gaps"].str.split(",").explode().str.strip()
+            .loc[lambda s: s != ""].value_counts().reset_index()
+        )
+        if not gap_count.empty:
             gap_count.columns = ["Skill", "Count"]
             fig2 = px.bar(
                 gap_count, x="Skill", y="Count",
@@ -281,7 +310,7 @@ elif page == "Admin Panel":
 
                 st.download_button(
                     "Download Full Report (CSV)",
-                    data.to_csv(index=False),
+                    _df_csv(data),
                     file_name="all_candidates_report.csv"
                 )
 
@@ -294,16 +323,8 @@ elif page == "Admin Panel":
                               template="plotly_dark")
                 st.plotly_chart(fig1, use_container_width=True)
 
-                gap_skills = []
-                for s in data["skill_gaps"]:
-                    for skill in s.split(","):
-                        if skill.strip():
-                            gap_skills.append(skill.strip())
-
-                if gap_skills:
-                    gap_df = pd.DataFrame(gap_skills, columns=["Skill Gap"])
-                    gap_count = gap_df["Skill Gap"].value_counts().reset_index()
-                    gap_count.columns = ["Skill", "Frequency"]
+                gap_count = load_skill_gap_counts()
+                if not gap_count.empty:
                     fig2 = px.bar(
                         gap_count, x="Skill", y="Frequency",
                         title="Most Common Skill Gaps (All Candidates)",
@@ -312,6 +333,14 @@ elif page == "Admin Panel":
                         template="plotly_dark"
                     )
                     st.plotly_chart(fig2, use_container_width=True)
+
+                # --- Re-rank every stored resume against the last analyzed role ---
+                if "selected_role" in st.session_state:
+                    selected_role = st.session_state["selected_role"]
+                    st.markdown("---")
+                    st.subheader(f"All Stored Resumes Ranked for: {selected_role}")
+                    jd_embedding, _ = get_jd_artifacts(selected_role)
+                    st.dataframe(rescore_all(jd_embedding), use_container_width=True)
         else:
             st.error("Invalid credentials. Try again.")
 
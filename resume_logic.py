@@ -1,12 +1,37 @@
-import re, sqlite3
+import re, sqlite3, hashlib
+import ahocorasick
+import numpy as np
 import pandas as pd
-from sentence_transformers import SentenceTransformer, util
+import streamlit as st
+from sentence_transformers import SentenceTransformer
 
-model = SentenceTransformer('all-MiniLM-L6-v2')
+MODEL_NAME = 'all-MiniLM-L6-v2'
+MODEL_FILE = "onnx/model_qint8_avx512_vnni.onnx"
+# Stored embeddings are only comparable when produced by the same checkpoint
+EMBEDDING_MODEL_ID = f"{MODEL_NAME}:{MODEL_FILE}"
+
+# ONNX Runtime backend with the prequantized int8 export for faster CPU inference;
+# cached so the weights load once per process across Streamlit reruns
+@st.cache_resource
+def _load_model():
+    return SentenceTransformer(
+        MODEL_NAME,
+        backend="onnx",
+        model_kwargs={"file_name": MODEL_FILE}
+    )
+
+model = _load_model()
+
+NAME_RE = re.compile(r'[A-Z][a-z]+\s[A-Z][a-z]+')
+EMAIL_RE = re.compile(r'[\w\.-]+@[\w\.-]+\.\w+')
+PHONE_RE = re.compile(r'\+?\d[\d\s\-\(\)]{8,}\d')
+SKILL_RE = re.compile(r'\b[A-Za-z\#\+]{2,15}\b')
 
 # --- Database setup ---
 connection = sqlite3.connect('resume_data.db', check_same_thread=False)
 cursor = connection.cursor()
+cursor.execute("PRAGMA journal_mode=WAL")
+cursor.execute("PRAGMA synchronous=NORMAL")
 cursor.execute("""CREATE TABLE IF NOT EXISTS candidates (
     id INTEGER PRIMARY KEY AUTOINCREMENT,
     name TEXT,
@@ -19,49 +44,186 @@ cursor.execute("""CREATE TABLE IF NOT EXISTS candidates (
     matched_skills TEXT,
     skill_gaps TEXT
 )""")
+if "file_hash" not in {col[1] for col in cursor.execute("PRAGMA table_info(candidates)")}:
+    cursor.execute("ALTER TABLE candidates ADD COLUMN file_hash TEXT")
+cursor.execute("""CREATE TABLE IF NOT EXISTS candidate_skills (
+    candidate_id INTEGER REFERENCES candidates(id),
+    skill TEXT,
+    kind TEXT
+)""")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_skills_kind_skill ON candidate_skills(kind, skill)")
+cursor.execute("CREATE INDEX IF NOT EXISTS idx_skills_candidate ON candidate_skills(candidate_id)")
+# Older caches were keyed by file hash alone; they are only a cache, so rebuild them
+if cursor.execute("SELECT 1 FROM sqlite_master WHERE name = 'resume_embeddings'").fetchone() and \
+        "model_id" not in {col[1] for col in cursor.execute("PRAGMA table_info(resume_embeddings)")}:
+    cursor.execute("DROP TABLE resume_embeddings")
+cursor.execute("""CREATE TABLE IF NOT EXISTS resume_embeddings (
+    file_hash TEXT,
+    model_id TEXT,
+    embedding BLOB,
+    PRIMARY KEY (file_hash, model_id)
+)""")
+
+# Backfill candidate_skills from the comma-joined columns of older rows
+if cursor.execute("SELECT 1 FROM candidate_skills LIMIT 1").fetchone() is None:
+    cursor.executemany("INSERT INTO candidate_skills (candidate_id, skill, kind) VALUES (?, ?, ?)", [
+        (cid, skill.strip(), kind)
+        for cid, matched, gaps in cursor.execute("SELECT id, matched_skills, skill_gaps FROM candidates").fetchall()
+        for kind, joined in (("matched", matched), ("gap", gaps))
+        for skill in (joined or "").split(",") if skill.strip()
+    ])
 connection.commit()
 
-def save_to_db(data):
-    cursor.execute("""INSERT INTO candidates 
-        (name, email, phone, filename, job_category, role, similarity, matched_skills, skill_gaps)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-        (data["name"], data["email"], data["phone"], data["filename"],
-         data["job_category"], data["role"], data["similarity"],
-         data["matched_skills"], data["skill_gaps"]))
+def save_many_to_db(records):
+    # Local cursor: the module-level one is shared by every session thread,
+    # so its lastrowid could belong to another session's insert
+    cur = connection.cursor()
+    skill_rows = []
+    for data in records:
+        cur.execute("""INSERT INTO candidates 
+            (name, email, phone, filename, file_hash, job_category, role, similarity, matched_skills, skill_gaps)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            (data["name"], data["email"], data["phone"], data["filename"], data["file_hash"],
+             data["job_category"], data["role"], data["similarity"],
+             ", ".join(data["matched_skills"]), ", ".join(data["skill_gaps"])))
+        candidate_id = cur.lastrowid
+        skill_rows += [(candidate_id, skill, "matched") for skill in data["matched_skills"]]
+        skill_rows += [(candidate_id, skill, "gap") for skill in data["skill_gaps"]]
+    cur.executemany("INSERT INTO candidate_skills (candidate_id, skill, kind) VALUES (?, ?, ?)", skill_rows)
     connection.commit()
 
 def load_all_data():
     return pd.read_sql("SELECT * FROM candidates", connection)
 
+def load_skill_gap_counts():
+    return pd.read_sql("""SELECT skill AS Skill, COUNT(*) AS Frequency
+        FROM candidate_skills WHERE kind = 'gap'
+        GROUP BY skill ORDER BY Frequency DESC""", connection)
+
 def extract_text(file):
-    import docx2txt, PyPDF2
+    import docx2txt
     if file.name.endswith('.pdf'):
-        reader = PyPDF2.PdfReader(file)
-        return "".join(page.extract_text() for page in reader.pages)
+        try:
+            import pypdfium2 as pdfium
+        except ImportError:
+            import PyPDF2
+            reader = PyPDF2.PdfReader(file)
+            # extract_text() can return None for image-only pages
+            parts = [page.extract_text() or "" for page in reader.pages]
+            return "".join(parts)
+        doc = pdfium.PdfDocument(file.read())
+        try:
+            return "".join(page.get_textpage().get_text_range() for page in doc)
+        finally:
+            doc.close()
     elif file.name.endswith('.docx'):
         return docx2txt.process(file)
     else:
         return file.read().decode('utf-8', errors='ignore')
 
+# Off by default: int8 scoring shifts scores slightly and can reorder near-ties
+INT8_SIMILARITY = False
+
+def _quantize_int8(mat):
+    scale = np.abs(mat).max(axis=1, keepdims=True) / 127
+    return np.round(mat / np.where(scale == 0, 1, scale)).astype(np.int8)
+
+def compute_similarities(jd_embedding, resume_embeddings):
+    import simsimd
+    if INT8_SIMILARITY:
+        # Per-vector symmetric int8 scaling; norms change, so score with cosine
+        jd_vec = _quantize_int8(jd_embedding[None, :])
+        resume_mat = _quantize_int8(resume_embeddings.astype(np.float32))
+        return (1 - np.asarray(simsimd.cdist(jd_vec, resume_mat, metric='cosine'))[0]).tolist()
+    jd_vec = jd_embedding.astype(np.float16)
+    resume_mat = resume_embeddings.astype(np.float16)
+    # Embeddings are L2-normalized at encode time, so cosine reduces to a dot product
+    return np.asarray(simsimd.cdist(jd_vec[None, :], resume_mat, metric='dot'))[0].tolist()
+
+def file_hash(file):
+    return hashlib.sha256(file.getvalue()).hexdigest()
+
+def get_resume_embeddings(hashes, texts):
+    # Reuse float16 embeddings stored for previously seen files; encode the rest in one batch.
+    # New rows are left in the open transaction for save_many_to_db to commit.
+    cur = connection.cursor()
+    placeholders = ", ".join("?" * len(hashes))
+    cached = dict(cur.execute(
+        f"""SELECT file_hash, embedding FROM resume_embeddings
+        WHERE model_id = ? AND file_hash IN ({placeholders})""",
+        [EMBEDDING_MODEL_ID, *hashes]).fetchall())
+    missing = [i for i, h in enumerate(hashes) if h not in cached]
+    if missing:
+        embeddings = model.encode(
+            [texts[i] for i in missing], batch_size=32,
+            normalize_embeddings=True, show_progress_bar=False
+        ).astype(np.float16)
+        rows = [(hashes[i], emb.tobytes()) for i, emb in zip(missing, embeddings)]
+        cur.executemany(
+            "INSERT OR IGNORE INTO resume_embeddings (file_hash, model_id, embedding) VALUES (?, ?, ?)",
+            [(h, EMBEDDING_MODEL_ID, blob) for h, blob in rows])
+        cached.update(rows)
+    return np.stack([np.frombuffer(cached[h], dtype=np.float16) for h in hashes])
+
+def rescore_all(jd_embedding):
+    # Re-rank every stored resume against a JD; bare columns come from each hash's latest candidate row.
+    # LEFT JOIN keeps embeddings whose candidate rows predate the file_hash column; candidate rows
+    # without a cached embedding cannot be rescored, since resume text is not stored.
+    rows = connection.cursor().execute("""SELECT COALESCE(c.name, 'Unknown'),
+            COALESCE(c.filename, 'sha256:' || substr(e.file_hash, 1, 12)), e.embedding, MAX(c.id)
+        FROM resume_embeddings e LEFT JOIN candidates c ON c.file_hash = e.file_hash
+        WHERE e.model_id = ?
+        GROUP BY e.file_hash""", (EMBEDDING_MODEL_ID,)).fetchall()
+    if not rows:
+        return pd.DataFrame(columns=["Name", "Resume", "Similarity"])
+    # cache=True keeps the compiled kernel on disk, so only the very first call pays the JIT cost
+    from vector_operations import cos_matrix
+    jd_vec = jd_embedding.astype(np.float32)[None, :]
+    resume_mat = np.stack([np.frombuffer(r[2], dtype=np.float16) for r in rows]).astype(np.float32)
+    similarities = cos_matrix(jd_vec, resume_mat)[0]
+    return pd.DataFrame({
+        "Name": [r[0] for r in rows],
+        "Resume": [r[1] for r in rows],
+        "Similarity": np.round(similarities * 100, 2)
+    }).sort_values("Similarity", ascending=False)
+
 def extract_candidate_details(text):
-    name = re.findall(r'[A-Z][a-z]+\s[A-Z][a-z]+', text)
-    email = re.findall(r'[\w\.-]+@[\w\.-]+\.\w+', text)
-    phone = re.findall(r'\+?\d[\d\s\-\(\)]{8,}\d', text)
-    skills = re.findall(r'\b[A-Za-z\#\+]{2,15}\b', text.lower())
+    # Only the first name/email/phone is used, so stop scanning at the first match
+    name = NAME_RE.search(text)
+    email = EMAIL_RE.search(text)
+    phone = PHONE_RE.search(text)
+    skills = match_known_skills(text.lower())
     return {
-        "Name": name[0] if name else "Unknown",
-        "Email": email[0] if email else "Not Found",
-        "Phone": phone[0] if phone else "Not Found",
-        "Skills": list(set(skills))
+        "Name": name.group() if name else "Unknown",
+        "Email": email.group() if email else "Not Found",
+        "Phone": phone.group() if phone else "Not Found",
+        "Skills": skills
     }
 
+def match_known_skills(lowered):
+    # Single Aho-Corasick pass over the text, keeping only whole-word hits. Like SKILL_RE,
+    # '_' counts as a word character, and a leading '#'/'+' joins the token (c#sql is not sql).
+    skills = set()
+    for end, skill in SKILL_AUTOMATON.iter(lowered):
+        start = end - len(skill) + 1
+        before = lowered[start - 1] if start > 0 else " "
+        after = lowered[end + 1] if end + 1 < len(lowered) else " "
+        if not (before.isalnum() or before in "_#+") and not (after.isalnum() or after == "_"):
+            skills.add(skill)
+    return skills
+
 def extract_skills_from_jd(jd_text):
-    return [s.lower().strip() for s in re.findall(r'\b[A-Za-z\#\+]{2,15}\b', jd_text)]
+    return [s.lower().strip() for s in SKILL_RE.findall(jd_text)]
+
+@st.cache_data
+def get_jd_artifacts(role):
+    jd_text = ROLE_SKILLS.get(role, "")
+    jd_embedding = model.encode(jd_text, normalize_embeddings=True)
+    return jd_embedding, extract_skills_from_jd(jd_text)
 
 def detect_skill_gaps(jd_skills, resume_skills):
-    matched = [s for s in jd_skills if s in resume_skills]
-    gaps = [s for s in jd_skills if s not in resume_skills]
-    return matched, gaps
+    jd_set, resume_set = set(jd_skills), set(resume_skills)
+    return sorted(jd_set & resume_set), sorted(jd_set - resume_set)
 
 JOB_CATEGORIES = {
     "Software Development": ["Frontend Developer", "Backend Developer", "Full Stack Developer"],
@@ -77,3 +239,9 @@ ROLE_SKILLS = {
     "DevOps Engineer": "AWS Docker Kubernetes Linux CI/CD",
     "Cloud Engineer": "AWS Azure GCP Terraform DevOps"
 }
+
+# Automaton over every skill term any role asks for, used to scan resumes
+SKILL_AUTOMATON = ahocorasick.Automaton()
+for skill in {s for jd_text in ROLE_SKILLS.values() for s in extract_skills_from_jd(jd_text)}:
+    SKILL_AUTOMATON.add_word(skill, skill)
+SKILL_AUTOMATON.make_automaton()
@@ -0,0 +1,30 @@
+import numpy as np
+from numba import njit, prange
+
+# Cosine similarity between every row of A and every row of B.
+# A is the small side (typically a single JD), so rows of B are spread across threads;
+# the inner dot products are auto-vectorized by LLVM.
+@njit(parallel=True, fastmath=True, cache=True)
+def cos_matrix(A, B):
+    n, m, d = A.shape[0], B.shape[0], A.shape[1]
+
+    a_norms = np.empty(n, dtype=np.float32)
+    for i in range(n):
+        acc = 0.0
+        for k in range(d):
+            acc += A[i, k] * A[i, k]
+        a_norms[i] = np.sqrt(acc)
+
+    out = np.empty((n, m), dtype=np.float32)
+    for j in prange(m):
+        b_norm = 0.0
+        for k in range(d):
+            b_norm += B[j, k] * B[j, k]
+        b_norm = np.sqrt(b_norm)
+        for i in range(n):
+            dot = 0.0
+            for k in range(d):
+                dot += A[i, k] * B[j, k]
+            denom = a_norms[i] * b_norm
+            out[i, j] = dot / denom if denom > 0 else 0.0
+    return out